@@ -4,10 +4,11 @@ import sys
 import traceback
 from collections.abc import Callable
 from contextlib import contextmanager
-from functools import lru_cache, partial
+from functools import partial
 from typing import Any
 
 from rich import print
+from rich.console import Console
 
 from apicov.func_tracer import FuncTracer
 from apicov.html import generate_html_report
@@ -33,7 +34,6 @@ def instrument_runpy(tracer):
         del runpy.exec
 
 
-@lru_cache
 def should_trace(filename: str) -> bool:
     if filename.startswith("<") and filename.endswith(">"):
         return False  # this is not a file on disk but some magic thing, skip it
@@ -43,9 +43,9 @@ def should_trace(filename: str) -> bool:
 
 
 def create_and_store_tracer(
-    storage: list[FuncTracer], func: Callable[..., Any], encapsulating_class: type | None
+    storage: list[FuncTracer], stop_when_covered: bool, func: Callable[..., Any], encapsulating_class: type | None
 ) -> FuncTracer:
-    tracer = FuncTracer.from_callable(func, encapsulating_class)
+    tracer = FuncTracer.from_callable(func, encapsulating_class, stop_when_covered)
     storage.append(tracer)
     return tracer
 
@@ -55,6 +55,11 @@ def main() -> int:
     parser.add_argument("script", nargs="?", default=None, help="Path to the script to execute")
     parser.add_argument("-m", dest="module", help="Run given module as a script")
     parser.add_argument("--html", action="store_true", help="Generate HTML report")
+    parser.add_argument(
+        "--stop-when-covered",
+        action="store_true",
+        help="Stop tracing functions once they are fully covered (faster, but subsequent calls are not reported)",
+    )
     args = parser.parse_args()
 
     if args.script and args.module:
@@ -64,7 +69,7 @@ def main() -> int:
         return 1
 
     func_tracers: list[FuncTracer] = []  # store FuncTracers created by the tracer, to analyze them after execution
-    tracer = Tracer(should_trace, partial(create_and_store_tracer, func_tracers))
+    tracer = Tracer(should_trace, partial(create_and_store_tracer, func_tracers, args.stop_when_covered))
     exit_code = 0
     try:
         with instrument_runpy(tracer):
@@ -84,30 +89,34 @@ def main() -> int:
         print("✓ Coverage report generated: report.html")
         return 0
 
-    header = f"Captured {len(func_tracers)} called functions in {args.script or args.module}:"
-    print("=" * len(header))
-    print(header)
-    for func_info in func_tracers:
-        func = func_info.original_func
-        formatted_name = f"[bold]{func.__module__}[/].[blue bold]{func.__qualname__}[/]"
-        for overload, coverage in func_info.analyze_coverage().items():
-            print(f"{formatted_name}[bold]{overload.signature}[/]: {coverage.total().ratio * 100:.0f}%")
-            calls = func_info.matched_calls[overload]
-            if not calls:
-                print("  [italic]no calls[/]")
-            for param_matches, result_match, exception in calls:
-                args_str = ", ".join(str(m) for m in param_matches)
-                if not exception:
-                    print(f"  ({args_str}) -> {result_match or '[red italic]unmatched[/]'}")
-                else:
-                    print(f"  ({args_str}) raised {exception}")
-        if func_info.unmatched_calls:
-            print(f"{formatted_name} [italic]unmatched[/]:")
-            for args_str, outcome, result_str in func_info.unmatched_calls:
-                if outcome == "return":
-                    print(f"  ({args_str}) -> {result_str}")
-                else:
-                    print(f"  ({args_str}) raised {result_str}")
+    # render the whole report into a buffer, and write it out at once instead of line by line
+    console = Console()
+    with console.capture() as capture:
+        header = f"Captured {len(func_tracers)} called functions in {args.script or args.module}:"
+        console.print("=" * len(header))
+        console.print(header)
+        for func_info in func_tracers:
+            func = func_info.original_func
+            formatted_name = f"[bold]{func.__module__}[/].[blue bold]{func.__qualname__}[/]"
+            for overload, coverage in func_info.analyze_coverage().items():
+                console.print(f"{formatted_name}[bold]{overload.signature}[/]: {coverage.total().ratio * 100:.0f}%")
+                calls = func_info.matched_calls[overload]
+                if not calls:
+                    console.print("  [italic]no calls[/]")
+                for param_matches, result_match, exception in calls:
+                    args_str = ", ".join(str(m) for m in param_matches)
+                    if not exception:
+                        console.print(f"  ({args_str}) -> {result_match or '[red italic]unmatched[/]'}")
+                    else:
+                        console.print(f"  ({args_str}) raised {exception}")
+            if func_info.unmatched_calls:
+                console.print(f"{formatted_name} [italic]unmatched[/]:")
+                for args_str, outcome, result_str in func_info.unmatched_calls:
+                    if outcome == "return":
+                        console.print(f"  ({args_str}) -> {result_str}")
+                    else:
+                        console.print(f"  ({args_str}) raised {result_str}")
+    sys.stdout.write(capture.get())
 
     return exit_code
 
@@ -1,75 +1,95 @@
 import inspect
 from collections.abc import Callable, Iterable, Mapping
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from functools import reduce
 from operator import mul
 from reprlib import Repr
-from types import FrameType
+from types import FrameType, FunctionType
 from typing import Any, Literal, Self, get_overloads
 
-from apicov.type_annotation import NoAnnotation, SelfAnnotation, TypeAnnotation, TypeCoverage, TypeMatch, get_annotation
+from apicov.type_annotation import (
+    AnyAnnotation,
+    InstanceAnnotation,
+    NeverAnnotation,
+    NoAnnotation,
+    SelfAnnotation,
+    TypeAnnotation,
+    TypeCoverage,
+    TypeMatch,
+    UnknownAnnotation,
+    get_annotation,
+)
 
 _repr = Repr(maxlong=20, maxstring=50, maxother=50).repr
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Overload:
     """Represents a single overload of a function, i.e. a specific combination of parameter and return types."""
 
     original_func: Callable[..., Any]
-    signature: inspect.Signature
+    param_names: tuple[str, ...]  # names of parameters, in the order of the signature
     param_annotations: tuple[TypeAnnotation, ...]  # type annotations for each parameter
     return_annotation: TypeAnnotation  # type annotation for the return value
+    # specialized implementation of `match`, generated for this overload's parameters
+    _match_fn: "_MatchFn" = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_match_fn", _compile_match_fn(self.param_names, self.param_annotations))
+
+    @property
+    def signature(self) -> inspect.Signature:
+        """Signature of the original function.
+
+        Tracing doesn't need it (parameters of plain functions are read from their code objects instead),
+        so it is computed on access by the reports which print it, once per overload.
+        """
+        return _get_signature(self.original_func)
 
     @classmethod
     def from_callable(cls, func: Callable[..., Any], encapsulating_class: type | None) -> Self:
-        try:
-            signature = inspect.signature(func, eval_str=True)
-        except Exception:
-            # perhaps the exception comes from evaluating stringized annotations, try again without evaluating them
-            signature = inspect.signature(func)
+        if _is_plain_function(func):
+            params, return_annotation = _get_function_params(func)
+        else:
+            signature = _get_signature(func)
+            params = [(param.name, param.annotation) for param in signature.parameters.values()]
+            return_annotation = signature.return_annotation
         return cls(
             func,
-            signature,
+            tuple(name for name, _ in params),
             tuple(
-                cls._get_param_annotation(i, param, encapsulating_class)
-                for i, param in enumerate(signature.parameters.values())
+                cls._get_param_annotation(i, name, annotation, encapsulating_class)
+                for i, (name, annotation) in enumerate(params)
             ),
-            cls._get_return_annotation(signature, encapsulating_class),
+            cls._get_return_annotation(return_annotation, encapsulating_class),
         )
 
     @staticmethod
-    def _get_param_annotation(index: int, param: inspect.Parameter, encapsulating_class: type | None) -> TypeAnnotation:
-        annotation = param.annotation
-        if (annotation is Self or (index == 0 and param.name == "self")) and encapsulating_class is not None:
+    def _get_param_annotation(
+        index: int, name: str, annotation: Any, encapsulating_class: type | None
+    ) -> TypeAnnotation:
+        if (annotation is Self or (index == 0 and name == "self")) and encapsulating_class is not None:
             return SelfAnnotation(encapsulating_class)
         if annotation is inspect.Parameter.empty:
             return NoAnnotation()
         return get_annotation(annotation)
 
     @staticmethod
-    def _get_return_annotation(signature: inspect.Signature, encapsulating_class: type | None) -> TypeAnnotation:
-        annotation = signature.return_annotation
+    def _get_return_annotation(annotation: Any, encapsulating_class: type | None) -> TypeAnnotation:
         if annotation is Self and encapsulating_class is not None:
             return SelfAnnotation(encapsulating_class)
         if annotation is inspect.Signature.empty:
             return NoAnnotation()
         return get_annotation(annotation)
 
-    def match(self, frame: FrameType) -> tuple[TypeMatch, ...] | None:
-        """Inspect the given frame, and match values against this overload's parameter annotations.
+    def match(self, f_locals: Mapping[str, Any]) -> tuple[TypeMatch, ...] | None:
+        """Match local variables of a frame against this overload's parameter annotations.
 
         The frame is expected to be at the start of a call to the function corresponding to this overload,
         so its local variables should correspond to the parameters of this overload.
         If all parameters match, return a tuple of their TypeMatches. If any parameter doesn't match, return None.
         """
-        matches = []
-        for param, annotation in zip(self.signature.parameters.values(), self.param_annotations):
-            match = annotation.match(frame.f_locals[param.name])
-            if match is None:
-                return None  # if any parameter doesn't match, this overload doesn't match
-            matches.append(match)
-        return tuple(matches)
+        return self._match_fn(f_locals)
 
     def analyze_coverage(self, matches: Iterable[tuple[tuple[TypeMatch, ...], TypeMatch]]) -> "OverloadCoverage":
         """Analyze total coverage of this overload based on the matches it produced in runtime."""
@@ -90,7 +110,97 @@ class Overload:
         return OverloadCoverage(coverages[:-1], coverages[-1])
 
 
-@dataclass(frozen=True)
+def _get_signature(func: Callable[..., Any]) -> inspect.Signature:
+    try:
+        return inspect.signature(func, eval_str=True)
+    except Exception:
+        # perhaps the exception comes from evaluating stringized annotations, try again without evaluating them
+        return inspect.signature(func)
+
+
+def _is_plain_function(func: Callable[..., Any]) -> bool:
+    """Check if the function's parameters can be read from its code object, as `inspect.signature` would see them."""
+    return type(func) is FunctionType and not hasattr(func, "__wrapped__") and not hasattr(func, "__signature__")
+
+
+def _get_function_params(func: FunctionType) -> tuple[list[tuple[str, Any]], Any]:
+    """Get names and annotations of parameters, and the return annotation of a plain function.
+
+    This is a cheaper equivalent of `inspect.signature`, which doesn't build Parameter objects
+    and doesn't look at defaults. Missing annotations are represented by `inspect.Parameter.empty`.
+    """
+    try:
+        annotations = inspect.get_annotations(func, eval_str=True)
+    except Exception:
+        # same as in `_get_signature`
+        annotations = inspect.get_annotations(func)
+    # co_varnames starts with positional parameters, followed by keyword-only ones, *args and **kwargs
+    code = func.__code__
+    names = code.co_varnames
+    n_positional = code.co_argcount
+    keyword_only = names[n_positional : n_positional + code.co_kwonlyargcount]
+    n_params = n_positional + len(keyword_only)
+    var_positional = names[n_params : n_params + 1] if code.co_flags & inspect.CO_VARARGS else ()
+    n_params += len(var_positional)
+    var_keyword = names[n_params : n_params + 1] if code.co_flags & inspect.CO_VARKEYWORDS else ()
+    # reorder them as in signature: positional, *args, keyword-only, **kwargs
+    ordered_names = (*names[:n_positional], *var_positional, *keyword_only, *var_keyword)
+    empty = inspect.Parameter.empty
+    params = [(name, annotations.get(name, empty)) for name in ordered_names]
+    return params, annotations.get("return", inspect.Signature.empty)
+
+
+type _MatchFn = Callable[[Mapping[str, Any]], tuple[TypeMatch, ...] | None]
+
+
+def _compile_match_fn(param_names: tuple[str, ...], param_annotations: tuple[TypeAnnotation, ...]) -> _MatchFn:
+    """Generate a function matching parameter values against annotations, with the loop over parameters unrolled.
+
+    Matching is the innermost part of tracing, so instead of iterating over parameters on each call,
+    generate straight-line code which looks up each parameter by a constant name. Simple instance annotations
+    are inlined as a builtin `isinstance` call with a constant match, `Any` annotations don't need to look at the value,
+    others are matched via their pre-bound `match` method. For example, for `(x: int, y: int | str)`:
+
+        def match(f_locals):
+            if not isinstance(f_locals['x'], t0):
+                return None
+            m1 = match1(f_locals['y'])
+            if m1 is None:
+                return None
+            return (m0, m1)
+    """
+    if any(type(annotation) in _NEVER_MATCHING_ANNOTATIONS for annotation in param_annotations):
+        return _never_match
+    namespace: dict[str, Any] = {}
+    lines = ["def match(f_locals):"]
+    for i, (name, annotation) in enumerate(zip(param_names, param_annotations)):
+        # if any parameter doesn't match, this overload doesn't match
+        if type(annotation) is AnyAnnotation:
+            namespace[f"m{i}"] = annotation.match(None)  # Any matches everything with the same match object
+        elif type(annotation) is InstanceAnnotation:
+            namespace[f"t{i}"] = annotation.typ
+            namespace[f"m{i}"] = annotation.shared_match
+            lines.append(f"    if not isinstance(f_locals[{name!r}], t{i}):")
+            lines.append("        return None")
+        else:
+            namespace[f"match{i}"] = annotation.match
+            lines.append(f"    m{i} = match{i}(f_locals[{name!r}])")
+            lines.append(f"    if m{i} is None:")
+            lines.append("        return None")
+    lines.append(f"    return ({''.join(f'm{i}, ' for i in range(len(param_names)))})")
+    exec("\n".join(lines), namespace)
+    return namespace["match"]
+
+
+# annotations which don't match any value, so overloads with such parameters never match
+_NEVER_MATCHING_ANNOTATIONS = (NeverAnnotation, UnknownAnnotation)
+
+
+def _never_match(f_locals: Mapping[str, Any]) -> None:
+    return None
+
+
+@dataclass(frozen=True, slots=True)
 class OverloadCoverage:
     """Represents the detailed coverage of a single overload."""
 
@@ -122,51 +232,142 @@ class FuncTracer:
         tuple[str, Literal["return", "unwind"], str],
         None,
     ]
+    # if set, the tracer asks to stop receiving events once all overloads are fully covered
+    stop_when_covered: bool = False
+    # the only overload of a function which is not overloaded, set in __post_init__
+    _single_overload: Overload = field(init=False, repr=False)
+    # argument types of unmatched calls, only the first call with each combination of types is recorded,
+    # so that repeated calls don't compute potentially expensive reprs of arguments and results again
+    _unmatched_arg_types: set[tuple[type, ...]] = field(init=False, repr=False, default_factory=set)
+    # whether all overloads are fully covered, only updated if `stop_when_covered` is set
+    _fully_covered: bool = field(init=False, repr=False, default=False)
+    # overloads which are not fully covered yet, and distinct (parameter matches, return match) pairs
+    # which count towards coverage of each overload, only used if `stop_when_covered` is set
+    _uncovered_overloads: set[Overload] = field(init=False, repr=False, default_factory=set)
+    _coverage_matches: Mapping[Overload, set[tuple[tuple[TypeMatch, ...], TypeMatch]]] = field(
+        init=False, repr=False, default_factory=dict
+    )
 
     @classmethod
-    def from_callable(cls, func: Callable[..., Any], encapsulating_class: type | None) -> Self:
+    def from_callable(
+        cls, func: Callable[..., Any], encapsulating_class: type | None, stop_when_covered: bool = False
+    ) -> Self:
         overloads = [Overload.from_callable(f, encapsulating_class) for f in get_overloads(func) or [func]]
         return cls(
             func,
             {overload: {} for overload in overloads},
             {},
+            stop_when_covered,
         )
 
-    type StartKey = tuple[Overload, tuple[TypeMatch, ...]] | tuple[None, str]
+    def __post_init__(self) -> None:
+        if self.stop_when_covered:
+            # overloads may be fully covered without any calls (e.g. if they have a Never parameter)
+            self._uncovered_overloads.update(
+                overload for overload, coverage in self.analyze_coverage().items() if coverage.total().ratio != 1.0
+            )
+            object.__setattr__(self, "_fully_covered", not self._uncovered_overloads)
+            object.__setattr__(self, "_coverage_matches", {overload: set() for overload in self.matched_calls})
+        # most functions are not overloaded, use a specialized on_start without the loop over overloads
+        if len(self.matched_calls) == 1:
+            (overload,) = self.matched_calls
+            object.__setattr__(self, "_single_overload", overload)
+            if all(type(annotation) is AnyAnnotation for annotation in overload.param_annotations):
+                # matching doesn't depend on argument values (e.g. there are no parameters),
+                # so the start key is always the same, and there is no need to inspect the frame
+                start_key = (overload, overload.match({}))
+                object.__setattr__(self, "on_start", lambda frame: start_key)
+            else:
+                object.__setattr__(self, "on_start", self._on_start_single)
+
+    type StartKey = tuple[Overload, tuple[TypeMatch, ...]] | tuple[None, str | None]
 
     def on_start(self, frame: FrameType) -> StartKey:
         """Select an overload matching this call, and return a key with parameter matches.
 
-        If no overload matches, return a key with a string representation of the arguments.
+        If no overload matches, return a key with a string representation of the arguments,
+        or None if a call with the same argument types is already recorded.
         """
+        # on Python < 3.13, each access to `frame.f_locals` re-syncs the dict with the frame, so only do it once
+        f_locals = frame.f_locals
         for overload in self.matched_calls.keys():
-            matches = overload.match(frame)
+            matches = overload.match(f_locals)
             if matches is not None:
                 return overload, matches
+        return self._unmatched_start_key(f_locals)
+
+    def _on_start_single(self, frame: FrameType) -> StartKey:
+        """Same as `on_start`, but for a function with exactly one overload."""
+        overload = self._single_overload
+        f_locals = frame.f_locals
+        matches = overload.match(f_locals)
+        if matches is not None:
+            return overload, matches
+        return self._unmatched_start_key(f_locals)
+
+    def _unmatched_start_key(self, f_locals: Mapping[str, Any]) -> StartKey:
         # if no overload matches, return the actual argument values for reporting
-        return None, ", ".join(f"{k}={_repr(v)}" for k, v in frame.f_locals.items())
+        # (only for the first call with such argument types, subsequent ones are not recorded)
+        arg_types = tuple(map(type, f_locals.values()))
+        if arg_types in self._unmatched_arg_types:
+            return None, None
+        self._unmatched_arg_types.add(arg_types)
+        return None, ", ".join(f"{k}={_repr(v)}" for k, v in f_locals.items())
 
-    def on_return(self, key: StartKey, retval: object) -> None:
-        """Record a call started with `key` which returned the given return value."""
+    def on_return(self, key: StartKey, retval: object) -> bool:
+        """Record a call started with `key` which returned the given return value.
+
+        Return True if no further calls need to be recorded (see `stop_when_covered`).
+        """
         if key[0] is not None:
             overload, matches = key
             return_match = overload.return_annotation.match(retval)
-            matched_key = (matches, return_match, None)
-            self.matched_calls[overload][matched_key] = None
+            self._record_matched_call(overload, (matches, return_match, None))
         else:
             _, args_str = key
-            self.unmatched_calls[(args_str, "return", _repr(retval))] = None
+            if args_str is not None:
+                self.unmatched_calls[(args_str, "return", _repr(retval))] = None
+        return self._fully_covered
 
-    def on_unwind(self, key: StartKey, exception: BaseException) -> None:
-        """Record a call started with `key` which raised the given exception."""
+    def on_unwind(self, key: StartKey, exception: BaseException) -> bool:
+        """Record a call started with `key` which raised the given exception.
+
+        Return True if no further calls need to be recorded (see `stop_when_covered`).
+        """
         if key[0] is not None:
             overload, matches = key
             return_match = overload.return_annotation.match_unwind(exception)
-            matched_key = (matches, return_match, _repr(exception))
-            self.matched_calls[overload][matched_key] = None
+            self._record_matched_call(overload, (matches, return_match, _repr(exception)))
         else:
             _, args_str = key
-            self.unmatched_calls[(args_str, "unwind", _repr(exception))] = None
+            if args_str is not None:
+                self.unmatched_calls[(args_str, "unwind", _repr(exception))] = None
+        return self._fully_covered
+
+    def _record_matched_call(
+        self, overload: Overload, call: tuple[tuple[TypeMatch, ...], TypeMatch | None, str | None]
+    ) -> None:
+        calls = self.matched_calls[overload]
+        if call not in calls:
+            calls[call] = None
+            if self.stop_when_covered:
+                self._update_fully_covered(overload, call)
+
+    def _update_fully_covered(
+        self, overload: Overload, call: tuple[tuple[TypeMatch, ...], TypeMatch | None, str | None]
+    ) -> None:
+        # coverage of an overload can only change when a new pair of matches counts towards it,
+        # and only the coverage of this overload needs to be analyzed again
+        matches, return_match, _ = call
+        if not return_match or overload not in self._uncovered_overloads:
+            return
+        coverage_matches = self._coverage_matches[overload]
+        if (matches, return_match) in coverage_matches:
+            return
+        coverage_matches.add((matches, return_match))
+        if overload.analyze_coverage(coverage_matches).total().ratio == 1.0:
+            self._uncovered_overloads.discard(overload)
+            object.__setattr__(self, "_fully_covered", not self._uncovered_overloads)
 
     def analyze_coverage(self) -> dict[Overload, OverloadCoverage]:
         """Analyze coverage of each overload based on recorded runtime values."""
@@ -134,9 +134,7 @@ def convert_signature(overload: Overload, coverage: OverloadCoverage) -> dict[st
     return {
         "params": {
             param_name: convert_type_annotation(anno, cov)
-            for param_name, anno, cov in zip(
-                overload.signature.parameters, overload.param_annotations, coverage.param_coverages
-            )
+            for param_name, anno, cov in zip(overload.param_names, overload.param_annotations, coverage.param_coverages)
         },
         "ret": convert_type_annotation(overload.return_annotation, coverage.return_coverage),
     }
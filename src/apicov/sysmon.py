@@ -4,12 +4,21 @@ This tracer uses the new `sys.monitoring` API to track function calls and their
 """
 
 import sys
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
 from types import CodeType, FrameType, ModuleType
 from typing import Any, Protocol, Self, TypeGuard
 
 # convenience alias for sys.monitoring, to avoid long names
 _sm = sys.monitoring
+# sys.monitoring.DISABLE, bound once to avoid attribute lookups in callbacks
+_DISABLE = _sm.DISABLE
+
+# sentinel for code objects missing from `Tracer._known_codes`, to look them up with a single `dict.get`
+_MISSING: Any = object()
+
+# number of tracing sessions started so far, and the number of the last session which used each tool ID
+_session_count = 0
+_last_sessions: dict[int, int] = {}
 
 
 class MonitoringCallbackError(BaseException):
@@ -33,6 +42,7 @@ class ShouldTraceFn(Protocol):
 
         Filename comes from `CodeType.co_filename`, so it may be a path,
         or some magic string like <module> or <string>.
+        The result is cached by the tracer, so it's called at most once per filename.
         """
 
 
@@ -46,11 +56,17 @@ class FuncTracer(Protocol):
         to this call, and can be used to correlate them with the start event.
         """
 
-    def on_return(self, start_key: Any, retval: object) -> None:
-        """Callback for function return event."""
+    def on_return(self, start_key: Any, retval: object) -> bool | None:
+        """Callback for function return event.
 
-    def on_unwind(self, start_key: Any, exception: BaseException) -> None:
-        """Callback for function unwind (exception) event."""
+        Returning True indicates that the tracer doesn't need any further events for this function.
+        """
+
+    def on_unwind(self, start_key: Any, exception: BaseException) -> bool | None:
+        """Callback for function unwind (exception) event.
+
+        Returning True indicates that the tracer doesn't need any further events for this function.
+        """
 
 
 class GetFuncTracerFn[FT: FuncTracer](Protocol):
@@ -65,63 +81,195 @@ class GetFuncTracerFn[FT: FuncTracer](Protocol):
         """
 
 
+# bound on_start, on_return and on_unwind methods of a FuncTracer,
+# looked up once per code object instead of on every event
+type _FuncTracerCallbacks = tuple[
+    Callable[[FrameType], Any],
+    Callable[[Any, object], bool | None],
+    Callable[[Any, BaseException], bool | None],
+]
+
+
 class Tracer[FT: FuncTracer]:
     def __init__(self, should_trace: ShouldTraceFn, get_func_tracer: GetFuncTracerFn[FT]) -> None:
         self._should_trace = should_trace
         self._get_func_tracer = get_func_tracer
-        # _known_codes stores FuncTracer instances or None if the code is not traceable
-        self._known_codes: dict[CodeType, FT | None] = {}
+        # _known_codes stores callbacks of FuncTracer instances, or None if the code is not traced
+        # (either because it comes from a file that should not be traced, or because it's not a function);
+        # it's keyed by id, because code objects compare by value (e.g. a function in a reloaded module
+        # is equal to the old one), while events are enabled for each code object separately
+        self._known_codes: dict[int, _FuncTracerCallbacks | None] = {}
+        # code objects in _known_codes, which are kept alive so that their ids are not reused
+        self._known_code_objects: list[CodeType] = []
+        # _file_decisions caches results of `should_trace` for each filename
+        self._file_decisions: dict[str, bool] = {}
+        # code object of our own method which is executed while monitoring is enabled
+        self._own_exit_code = self.__exit__.__code__
+        # tool ID and number of the last session of this tracer
+        self._last_session: tuple[int, int] | None = None
 
     def __enter__(self) -> Self:
-        self._call_stack: list[tuple[CodeType, FT | None, Any]] = []
+        # call stack of traced codes, stored as parallel lists to avoid allocating a tuple per call
+        self._cs_codes: list[CodeType] = []
+        self._cs_callbacks: list[_FuncTracerCallbacks] = []
+        self._cs_keys: list[Any] = []
+        # call stack indices of the outermost calls of codes which should stop being traced (see _stop_tracing)
+        self._pending_stops: dict[int, int] = {}
         self.tool_id = _get_tool_id()
         _sm.use_tool_id(self.tool_id, "apicov")
-        _sm.register_callback(self.tool_id, _sm.events.PY_START, self._start_callback)
-        _sm.register_callback(self.tool_id, _sm.events.PY_RETURN, self._return_callback)
-        _sm.register_callback(self.tool_id, _sm.events.PY_UNWIND, self._unwind_callback)
-        _sm.set_events(self.tool_id, _sm.events.PY_START | _sm.events.PY_RETURN | _sm.events.PY_UNWIND)
+        self._restart_events_if_needed()
+        # PY_START is needed globally to discover new code objects, but PY_RETURN is only enabled
+        # locally for traced code objects (see _enable_return_events), so that other code doesn't
+        # trigger it at all; PY_UNWIND can't be enabled locally, so it's enabled globally, but
+        # lazily when the first traced code starts, because until then there is nothing to unwind
+        start_callback, return_callback, unwind_callback = self._create_callbacks()
+        _sm.register_callback(self.tool_id, _sm.events.PY_START, start_callback)
+        _sm.register_callback(self.tool_id, _sm.events.PY_RETURN, return_callback)
+        _sm.register_callback(self.tool_id, _sm.events.PY_UNWIND, unwind_callback)
+        for code in self._traced_codes():
+            _sm.set_local_events(self.tool_id, code, _sm.events.PY_RETURN)
+        _sm.set_events(self.tool_id, _sm.events.PY_START)
         return self
 
+    def _restart_events_if_needed(self) -> None:
+        global _session_count
+        _session_count += 1
+        previous_session = (self.tool_id, _last_sessions.get(self.tool_id))
+        self._last_session, previous_own_session = (self.tool_id, _session_count), self._last_session
+        _last_sessions[self.tool_id] = _session_count
+        if previous_own_session == previous_session:
+            # this tracer was the last one to use the tool ID, so the events it disabled should stay disabled:
+            # codes which are not traced are remembered, and won't be traced in this session either
+            return
+        # otherwise, events might have been disabled for this tool ID by someone else (freeing the ID doesn't reset
+        # them), which would hide codes from this tracer; note that this re-enables events disabled by all tools
+        # in the process, not only by this one, so other tools (e.g. coverage.py) may receive some events again
+        _sm.restart_events()
+
+    def _enable_return_events(self, code: CodeType) -> None:
+        _sm.set_local_events(self.tool_id, code, _sm.events.PY_RETURN)
+
+    def _enable_unwind_events(self) -> None:
+        _sm.set_events(self.tool_id, _sm.events.PY_START | _sm.events.PY_UNWIND)
+
+    def _traced_codes(self) -> Iterator[CodeType]:
+        return (code for code in self._known_code_objects if self._known_codes[id(code)] is not None)
+
     def __exit__(self, exc_type, exc_value, traceback) -> None:
         _sm.set_events(self.tool_id, _sm.events.NO_EVENTS)
+        # local events are not reset when the tool ID is freed
+        for code in self._traced_codes():
+            _sm.set_local_events(self.tool_id, code, _sm.events.NO_EVENTS)
         _sm.free_tool_id(self.tool_id)
 
         if exc_type is not MonitoringCallbackError:
-            assert not self._call_stack
+            assert not self._cs_codes
 
     # Signatures for sys.monitoring callbacks can be found here:
-    # https://docs.python.org/3/library/_sm.html#callback-function-arguments
+    # https://docs.python.org/3/library/sys.monitoring.html#callback-function-arguments
 
-    def _start_callback(self, code: CodeType, instruction_offset: int) -> None:
-        try:
-            if code is self.__exit__.__code__:
-                return  # entering our own __exit__ method, skip
-            if not self._should_trace(code.co_filename):
+    def _create_callbacks(self) -> tuple[Callable[..., Any], Callable[..., Any], Callable[..., Any]]:
+        """Create sys.monitoring callbacks for the current session.
+
+        Callbacks are closures rather than bound methods, so that the state they access on every event
+        is read from cell variables instead of being looked up as attributes of `self`.
+
+        Exceptions are translated into MonitoringCallbackError only around code which may actually raise
+        (user-provided callables and call stack bookkeeping), the filtering on the common path stays outside.
+        """
+        known_codes = self._known_codes
+        known_codes_get = known_codes.get
+        known_code_objects = self._known_code_objects
+        cs_codes = self._cs_codes
+        cs_callbacks = self._cs_callbacks
+        cs_keys = self._cs_keys
+        own_exit_code = self._own_exit_code
+        unwind_events_enabled = False
+
+        def start_callback(code: CodeType, instruction_offset: int) -> Any:
+            nonlocal unwind_events_enabled
+            if code is own_exit_code:
+                return _DISABLE  # entering our own __exit__ method, skip
+
+            # if this `code` hasn't been seen before, create a FuncTracer for it (if possible)
+            callbacks = known_codes_get(id(code), _MISSING)
+            if callbacks is _MISSING:
+                try:
+                    callbacks = known_codes[id(code)] = self._classify_code(code)
+                    known_code_objects.append(code)
+                    if callbacks is not None:
+                        self._enable_return_events(code)
+                except Exception as e:
+                    raise MonitoringCallbackError from e
+
+            # codes which are not traced are not pushed to the call stack, and their events are disabled
+            if callbacks is None:
+                return _DISABLE
+            if not unwind_events_enabled:
+                self._enable_unwind_events()
+                unwind_events_enabled = True
+
+            # this function is traceable (code maps to a FuncTracer), call its on_start callback
+            try:
+                frame = sys._getframe(1)  # caller's frame is the monitored code frame
+                assert frame.f_code is code
+                key = callbacks[0](frame)
+            except Exception as e:
+                raise MonitoringCallbackError from e
+
+            cs_codes.append(code)
+            cs_callbacks.append(callbacks)
+            cs_keys.append(key)
+
+        def return_callback(code: CodeType, instruction_offset: int, retval: object) -> Any:
+            # return events are only enabled for traced code objects, so no need to filter them here
+            try:
+                started_code = cs_codes.pop()
+                callbacks = cs_callbacks.pop()
+                key = cs_keys.pop()
+                assert started_code is code, f"mismatched start and return events: {started_code}, {code}"
+
+                if callbacks[1](key, retval):
+                    self._stop_tracing(code)
+            except Exception as e:
+                raise MonitoringCallbackError from e
+
+        def unwind_callback(code: CodeType, instruction_offset: int, exception: BaseException) -> None:
+            if type(exception) is MonitoringCallbackError:  # it has no subclasses, so compare the type directly
+                return  # an exception occured in our callbacks code (oopsie), nothing to trace
+
+            # unlike other events, PY_UNWIND cannot be disabled, so untraced codes have to be filtered here
+            if known_codes_get(id(code)) is None:
                 return
-            return self._start_callback_inner(code)
-        except Exception as e:
-            raise MonitoringCallbackError from e
-
-    def _start_callback_inner(self, code: CodeType) -> None:
-        # if this `code` hasn't been seen before, create a FuncTracer for it (if possible)
-        if code not in self._known_codes:
-            module_name = sys._getframemodulename(2)  # 2nd caller's frame is the monitored code frame
-            if module_name is None:
-                # not sure why this may happen, but just don't trace it
-                tracer = None
-            else:
-                tracer = self._new_func_tracer(module_name, code.co_qualname)
-            self._known_codes[code] = tracer
-
-        # if this function is traceable (code maps to a FuncTracer), call its on_start callback
-        key = None
-        tracer = self._known_codes[code]
-        if tracer is not None:
-            frame = sys._getframe(2)  # 2nd caller's frame is the monitored code frame
-            assert frame.f_code is code
-            key = tracer.on_start(frame)
-
-        self._call_stack.append((code, tracer, key))
+
+            try:
+                started_code = cs_codes.pop()
+                callbacks = cs_callbacks.pop()
+                key = cs_keys.pop()
+                assert started_code is code, f"mismatched start and unwind events: {started_code}, {code}"
+
+                if callbacks[2](key, exception):
+                    self._stop_tracing(code)
+            except Exception as e:
+                raise MonitoringCallbackError from e
+
+        return start_callback, return_callback, unwind_callback
+
+    def _classify_code(self, code: CodeType) -> _FuncTracerCallbacks | None:
+        filename = code.co_filename
+        should_trace = self._file_decisions.get(filename)
+        if should_trace is None:
+            should_trace = self._file_decisions[filename] = self._should_trace(filename)
+        if not should_trace:
+            return None
+        module_name = sys._getframemodulename(2)  # 2nd caller's frame is the monitored code frame
+        if module_name is None:
+            # not sure why this may happen, but just don't trace it
+            return None
+        tracer = self._new_func_tracer(module_name, code.co_qualname)
+        if tracer is None:
+            return None
+        return tracer.on_start, tracer.on_return, tracer.on_unwind
 
     def _new_func_tracer(self, module_name: str, qualname: str) -> FT | None:
         # try to create a tracer for this code object
@@ -139,35 +287,23 @@ class Tracer[FT: FuncTracer]:
             pass
         return None
 
-    def _return_callback(self, code: CodeType, instruction_offset: int, retval: object) -> None:
-        try:
-            if code is self.__enter__.__code__:
-                return  # leaving our own __enter__ method, skip
-            if not self._should_trace(code.co_filename):
-                return
-            return self._return_callback_inner(code, retval)
-        except Exception as e:
-            raise MonitoringCallbackError from e
-
-    def _return_callback_inner(self, code: CodeType, retval: object) -> None:
-        started_code, traced_func, key = self._call_stack.pop()
-        assert started_code is code, f"mismatched start and return events: {started_code}, {code}"
-
-        if traced_func is not None:
-            traced_func.on_return(key, retval)
-
-    def _unwind_callback(self, code: CodeType, instruction_offset: int, exception: BaseException) -> None:
-        if isinstance(exception, MonitoringCallbackError):
-            return  # an exception occured in our callbacks code (oopsie), nothing to trace
-
-        if not self._should_trace(code.co_filename):
+    def _stop_tracing(self, code: CodeType) -> None:
+        # events can only be disabled once there are no more calls of this code on the call stack
+        # (e.g. in recursion), otherwise their return events would be lost; if there are, the
+        # FuncTracer is expected to keep requesting to stop, so this will be retried on their return
+        cs_codes = self._cs_codes
+        outermost = self._pending_stops.get(id(code))
+        if outermost is not None and outermost < len(cs_codes) and cs_codes[outermost] is code:
+            # the outermost call is still on the stack (the stack below it didn't change since it was found)
             return
-
-        started_code, traced_func, key = self._call_stack.pop()
-        assert started_code is code, f"mismatched start and unwind events: {started_code}, {code}"
-
-        if traced_func is not None:
-            traced_func.on_unwind(key, exception)
+        # the outermost call is searched only once, instead of searching for any call on each return
+        outermost = next((i for i, cs_code in enumerate(cs_codes) if cs_code is code), None)
+        if outermost is not None:
+            self._pending_stops[id(code)] = outermost
+            return
+        self._pending_stops.pop(id(code), None)
+        self._known_codes[id(code)] = None  # PY_START will be disabled on the next call
+        _sm.set_local_events(self.tool_id, code, _sm.events.NO_EVENTS)
 
 
 def _get_tool_id() -> int:
@@ -181,11 +317,13 @@ def _get_tool_id() -> int:
 
 
 def _get_obj_and_encapsulating_obj(module: ModuleType, qualname: str) -> tuple[object, object | None]:
-    parts = qualname.split(".")
-    encapsulating_obj = None
-    obj = module
-    for part in parts:
-        encapsulating_obj, obj = obj, getattr(obj, part)
+    if "." not in qualname:
+        # fast path for module-level functions, which are the most common
+        encapsulating_obj, obj = module, getattr(module, qualname)
+    else:
+        encapsulating_obj, obj = None, module
+        for part in qualname.split("."):
+            encapsulating_obj, obj = obj, getattr(obj, part)
     while hasattr(obj, "__wrapped__"):  # unwrap decorated functions to get to the original one
         obj = obj.__wrapped__
     return obj, encapsulating_obj
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
-from types import NoneType
-from typing import Any, Never, NoReturn
+from functools import cache
+from types import NoneType, UnionType
+from typing import Any, ClassVar, Never, NoReturn, Union
 
 from typing_inspect import get_args, is_union_type
 
@@ -18,6 +19,8 @@ class TypeMatch:
     any information, since the annotation doesn't require any specific type.
     """
 
+    __slots__ = ()
+
 
 @dataclass(frozen=True, slots=True)
 class TypeCoverage:
@@ -72,6 +75,8 @@ class TypeAnnotation:
     from matches produced by this annotation.
     """
 
+    __slots__ = ()
+
     def match(self, value: object) -> TypeMatch | None:
         """Check if the given value matches this type annotation."""
         raise NotImplementedError
@@ -93,6 +98,8 @@ class TypeAnnotation:
 class NoAnnotation(TypeAnnotation):
     """Special class to handle an absence of a type annotation in a generic way."""
 
+    __slots__ = ()
+
     def __str__(self) -> str:
         return "<no annotation>"
 
@@ -103,13 +110,22 @@ class NoAnnotation(TypeAnnotation):
         def __str__(self) -> str:
             return self.label
 
+    # match objects only depend on the label, so they are shared between all matches with the same label
+    _matches_by_label: ClassVar[dict[str, Match]] = {}
+
     def match(self, value: object) -> TypeMatch | None:
-        return self.Match("None" if value is None else type(value).__qualname__)  # matches everything
+        label = "None" if value is None else type(value).__qualname__
+        match = self._matches_by_label.get(label)
+        if match is None:
+            match = self._matches_by_label[label] = self.Match(label)
+        return match  # matches everything
 
 
 class SelfAnnotation(TypeAnnotation):
     """Represents the `Self` type annotation bound to a class."""
 
+    __slots__ = ("bound_class",)
+
     def __init__(self, bound_class: type) -> None:
         self.bound_class = bound_class
 
@@ -127,17 +143,44 @@ class SelfAnnotation(TypeAnnotation):
 
 
 def get_annotation(annotation: Any) -> TypeAnnotation:
-    """Parse a type annotation and return a TypeAnnotation object representing it."""
-    if annotation is None or annotation is NoneType:
-        return NoneAnnotation()
-    if annotation is Any:
-        return AnyAnnotation()
-    if annotation is Never or annotation is NoReturn:
-        return NeverAnnotation()
+    """Parse a type annotation and return a TypeAnnotation object representing it.
+
+    Since the same annotations tend to appear in many signatures, parsed annotations are cached and shared.
+    """
+    if type(annotation) is type:
+        # plain classes only compare equal to themselves, so they don't need to be told apart by repr
+        return _get_annotation_cached(annotation, "")
+    try:
+        # annotations which compare equal may still differ in a meaningful way (e.g. `int | str == str | int`,
+        # but the order of union options affects matching), so use repr to tell them apart
+        return _get_annotation_cached(annotation, repr(annotation))
+    except TypeError:
+        # unhashable annotation, parse it without caching
+        return _parse_annotation(annotation)
+
+
+@cache
+def _get_annotation_cached(annotation: Any, annotation_repr: str) -> TypeAnnotation:
+    return _parse_annotation(annotation)
+
+
+def _parse_annotation(annotation: Any) -> TypeAnnotation:
+    special_annotation = _SPECIAL_ANNOTATIONS.get(id(annotation))
+    if special_annotation is not None:
+        return special_annotation()
+    if type(annotation) in _UNION_TYPES:
+        # fast path for the common union types, which don't need to go through typing_inspect
+        return UnionAnnotation(*map(get_annotation, annotation.__args__))
     if is_union_type(annotation):
         return UnionAnnotation(*map(get_annotation, get_args(annotation)))
+    if type(annotation) is type:
+        # plain classes always support isinstance checks
+        return InstanceAnnotation(annotation)
     try:
-        isinstance(None, annotation)  # check if it's a simple type annotation
+        # check if it's a simple type annotation: classes with custom metaclasses may reject instance checks
+        # (e.g. TypedDicts or protocols which are not runtime-checkable), while some annotations which
+        # are not classes support them (e.g. `typing.Callable`)
+        isinstance(None, annotation)
         return InstanceAnnotation(annotation)
     except TypeError:
         return UnknownAnnotation(repr(annotation))
@@ -146,6 +189,8 @@ def get_annotation(annotation: Any) -> TypeAnnotation:
 class NoneAnnotation(TypeAnnotation):
     """Represents the `None` type annotation."""
 
+    __slots__ = ()
+
     def __str__(self) -> str:
         return "None"
 
@@ -162,6 +207,8 @@ class NoneAnnotation(TypeAnnotation):
 class AnyAnnotation(TypeAnnotation):
     """Represents the `Any` type annotation. Matches all runtime values."""
 
+    __slots__ = ()
+
     def __str__(self) -> str:
         return "Any"
 
@@ -187,6 +234,8 @@ class NeverAnnotation(TypeAnnotation):
     since the function does not return in this case.
     """
 
+    __slots__ = ()
+
     def __str__(self) -> str:
         return "Never"
 
@@ -214,8 +263,11 @@ class NeverAnnotation(TypeAnnotation):
 class InstanceAnnotation(TypeAnnotation):
     """Represents a simple type annotation like `int` or `str`."""
 
+    __slots__ = ("shared_match", "typ")
+
     def __init__(self, typ: type):
         self.typ = typ
+        self.shared_match = self.Match(typ)  # the match only depends on the type, so all matches share it
 
     def __str__(self) -> str:
         return self.typ.__name__
@@ -229,15 +281,30 @@ class InstanceAnnotation(TypeAnnotation):
 
     def match(self, value: object) -> TypeMatch | None:
         if isinstance(value, self.typ):
-            return self.Match(self.typ)
+            return self.shared_match
         return None
 
 
 class UnionAnnotation(TypeAnnotation):
     """Represents a union type annotation like `int | str`."""
 
+    __slots__ = ("_matches_by_type", "options")
+
     def __init__(self, *options: TypeAnnotation):
+        # typing already flattens nested unions, but do it here too in case they are created manually,
+        # so that matching is a single scan over options, and each of them counts towards the coverage
+        if any(type(option) is UnionAnnotation for option in options):
+            options = tuple(
+                nested
+                for option in options
+                for nested in (option.options if type(option) is UnionAnnotation else (option,))
+            )
         self.options = options
+        # if the result of matching depends only on the type of a value (e.g. for `int | str | None`),
+        # matches are memoized by type, so that values of already seen types don't scan the options
+        self._matches_by_type: dict[type, TypeMatch | None] | None = (
+            {} if all(map(_is_matched_by_type, options)) else None
+        )
 
     @dataclass(frozen=True, slots=True)
     class Match(TypeMatch):
@@ -248,6 +315,20 @@ class UnionAnnotation(TypeAnnotation):
             return str(self.match)
 
     def match(self, value: object) -> TypeMatch | None:
+        matches_by_type = self._matches_by_type
+        if matches_by_type is None:
+            return self._match_options(value)
+        typ = type(value)
+        match = matches_by_type.get(typ, _NOT_MEMOIZED)
+        if match is _NOT_MEMOIZED:
+            match = self._match_options(value)
+            # isinstance also consults `__class__`, which may be overridden per instance (e.g. by mocks),
+            # and the memo is bounded, since such objects often come with a dedicated type per instance
+            if value.__class__ is typ and len(matches_by_type) < _MAX_MEMOIZED_TYPES:
+                matches_by_type[typ] = match
+        return match
+
+    def _match_options(self, value: object) -> TypeMatch | None:
         for option in self.options:
             match = option.match(value)
             if match is not None:
@@ -262,9 +343,25 @@ class UnionAnnotation(TypeAnnotation):
         return self.UnionCoverage(len(matches), len(self.options), {match.option for match in matches})
 
 
+# sentinel for types missing from `UnionAnnotation._matches_by_type`
+_NOT_MEMOIZED: Any = object()
+# maximum number of types memoized per union
+_MAX_MEMOIZED_TYPES = 64
+
+
+def _is_matched_by_type(annotation: TypeAnnotation) -> bool:
+    """Check if matching a value against the annotation depends only on the type of the value."""
+    if type(annotation) is NoneAnnotation:
+        return True
+    # custom metaclasses may implement `__instancecheck__` (e.g. ABCs and protocols), so only plain classes qualify
+    return type(annotation) is InstanceAnnotation and type(annotation.typ) is type
+
+
 class UnknownAnnotation(TypeAnnotation):
     """Fallback annotation for unsupported annotations."""
 
+    __slots__ = ("label",)
+
     def __init__(self, label: str):
         self.label = label
 
@@ -273,3 +370,16 @@ class UnknownAnnotation(TypeAnnotation):
 
     def match(self, value: object) -> TypeMatch | None:
         return None  # we don't know how to check this type, so match nothing to avoid false positives
+
+
+# annotations which always correspond to the same TypeAnnotation, keyed by id to support unhashable lookups
+_SPECIAL_ANNOTATIONS: dict[int, type[TypeAnnotation]] = {
+    id(None): NoneAnnotation,
+    id(NoneType): NoneAnnotation,
+    id(Any): AnyAnnotation,
+    id(Never): NeverAnnotation,
+    id(NoReturn): NeverAnnotation,
+}
+
+# types of `X | Y` and `Union[X, Y]` (including `Optional[X]`) annotations
+_UNION_TYPES = frozenset((UnionType, type(Union[int, str])))  # noqa: UP007 (intentional usage of Union)
@@ -0,0 +1,44 @@
+import inspect
+
+import pytest
+
+from apicov.func_tracer import _get_function_params, _is_plain_function
+
+
+def _positional_only(a, b: int, /, c): ...
+
+
+def _var_positional(a, *args: str): ...
+
+
+def _keyword_only(a, *, b: int, c=1): ...
+
+
+def _var_keyword(a, **kwargs: bytes) -> None: ...
+
+
+def _all_kinds(a: int, /, b, *args: str, c: float = 1.0, d, **kwargs: bytes) -> None:
+    local = a  # locals which are not parameters must be ignored
+    return local
+
+
+def _make_closure():
+    free = 1
+
+    def closure(a: int, *args, b, **kwargs) -> int:
+        local = free
+        return local
+
+    return closure
+
+
+@pytest.mark.parametrize(
+    "func",
+    [_positional_only, _var_positional, _keyword_only, _var_keyword, _all_kinds, _make_closure(), lambda: None],
+)
+def test_get_function_params_matches_signature(func):
+    assert _is_plain_function(func)
+    signature = inspect.signature(func)
+    params, return_annotation = _get_function_params(func)
+    assert params == [(param.name, param.annotation) for param in signature.parameters.values()]
+    assert return_annotation == signature.return_annotation
@@ -0,0 +1,81 @@
+import importlib
+import sys
+from typing import Never
+
+import pytest
+
+from apicov.func_tracer import FuncTracer
+from apicov.sysmon import Tracer
+
+
+def _create_tracer(should_trace, **kwargs):
+    """Create a Tracer which creates FuncTracers for traced functions and collects them into a list."""
+    func_tracers = []
+
+    def get_func_tracer(func, encapsulating_class):
+        func_tracer = FuncTracer.from_callable(func, encapsulating_class, **kwargs)
+        func_tracers.append(func_tracer)
+        return func_tracer
+
+    return Tracer(should_trace, get_func_tracer), func_tracers
+
+
+def test_reloaded_module_is_traced(tmp_path, monkeypatch):
+    (tmp_path / "reloaded_module.py").write_text("def double(x: int) -> int:\n    return 2 * x\n")
+    monkeypatch.syspath_prepend(tmp_path)
+    monkeypatch.delitem(sys.modules, "reloaded_module", raising=False)
+    module = importlib.import_module("reloaded_module")
+
+    tracer, func_tracers = _create_tracer(lambda filename: filename == module.__file__)
+    with tracer:
+        module.double(1)
+        # the reloaded function has a new code object, which compares equal to the old one
+        importlib.reload(module)
+        module.double(2)
+
+    assert [func_tracer.original_func.__qualname__ for func_tracer in func_tracers] == ["double", "double"]
+    for func_tracer in func_tracers:
+        (calls,) = func_tracer.matched_calls.values()
+        assert [str(return_match) for _, return_match, _ in calls] == ["int"]
+
+
+def _factorial(n: int) -> int:
+    return 1 if n <= 1 else n * _factorial(n - 1)
+
+
+def _fail(n: int) -> Never:
+    if n > 0:
+        _fail(n - 1)
+    raise ValueError(n)
+
+
+@pytest.mark.parametrize("stop_when_covered", [False, True])
+def test_stop_when_covered_recursion(stop_when_covered):
+    tracer, func_tracers = _create_tracer(lambda filename: filename == __file__, stop_when_covered=stop_when_covered)
+    with tracer:
+        assert _factorial(5) == 120  # covered when the innermost call returns, with 4 more calls on the stack
+        assert _factorial(3) == 6
+        with pytest.raises(TypeError):
+            _factorial("5")
+
+    (func_tracer,) = func_tracers
+    (calls,) = func_tracer.matched_calls.values()
+    assert [str(return_match) for _, return_match, _ in calls] == ["int"]
+    # once the function is covered, further calls are not traced at all
+    assert len(func_tracer.unmatched_calls) == (0 if stop_when_covered else 1)
+
+
+@pytest.mark.parametrize("stop_when_covered", [False, True])
+def test_stop_when_covered_exceptions(stop_when_covered):
+    tracer, func_tracers = _create_tracer(lambda filename: filename == __file__, stop_when_covered=stop_when_covered)
+    with tracer:
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                _fail(3)  # covered when the innermost call unwinds, with 3 more calls on the stack
+        with pytest.raises(TypeError):
+            _fail("3")
+
+    (func_tracer,) = func_tracers
+    (calls,) = func_tracer.matched_calls.values()
+    assert [(str(return_match), exception) for _, return_match, exception in calls] == [("Never", "ValueError(0)")]
+    assert len(func_tracer.unmatched_calls) == (0 if stop_when_covered else 1)
@@ -1,8 +1,8 @@
-from typing import Any, Never, NoReturn, Optional, Union
+from typing import Any, Never, NoReturn, Optional, Protocol, TypedDict, Union
 
 import pytest
 
-from apicov.type_annotation import SelfAnnotation, get_annotation
+from apicov.type_annotation import SelfAnnotation, UnionAnnotation, UnknownAnnotation, get_annotation
 
 
 @pytest.mark.parametrize(
@@ -49,3 +49,41 @@ def test_self_annotation_match():
     assert not bar_annot.match(Foo())
     assert bar_annot.match(Bar())
     assert not bar_annot.match(42)
+
+
+def test_get_annotation_cache():
+    assert get_annotation(int) is get_annotation(int)
+    assert get_annotation(int | str) is get_annotation(int | str)
+    # equal unions with different order of options must not share the parsed annotation
+    assert [str(opt) for opt in get_annotation(str | int).options] == ["str", "int"]
+    assert [str(opt) for opt in get_annotation(int | str).options] == ["int", "str"]
+
+
+def test_union_annotation_match_memoized_by_type():
+    class Number(int): ...
+
+    annot = get_annotation(int | bool | None)
+    for _ in range(2):  # second round hits memoized matches
+        assert str(annot.match(True)) == "int"  # first matching option wins, even though bool is more specific
+        assert str(annot.match(Number(1))) == "int"
+        assert str(annot.match(None)) == "None"
+        assert annot.match("hello") is None
+
+
+def test_union_annotation_flattens_nested_unions():
+    annot = UnionAnnotation(get_annotation(int), get_annotation(str | None))
+    assert [str(opt) for opt in annot.options] == ["int", "str", "None"]
+    assert str(annot.match(None)) == "None"
+
+
+def test_classes_without_instance_checks_are_unknown():
+    class Point(TypedDict):
+        x: int
+
+    class SupportsClose(Protocol):
+        def close(self) -> None: ...
+
+    for annotation in (Point, SupportsClose):
+        annot = get_annotation(annotation)
+        assert isinstance(annot, UnknownAnnotation)
+        assert annot.match({"x": 1}) is None